@@ -4,9 +4,13 @@ Combines Data and Operations (RPC/Action) schemas into a single output.
 """
 
 from __future__ import print_function
+import concurrent.futures
+import multiprocessing
 import optparse
 import logging
-import json
+import re
+import sys
+import orjson
 from pyang import plugin
 
 
@@ -42,6 +46,19 @@ class JSONSchemaPlugin(plugin.PyangPlugin):
                 action="store_true",
                 help="Only include nodes where config is true (applies to 'data' section only)",
             ),
+            optparse.make_option(
+                "--jsonschema-dedup",
+                dest="schema_dedup",
+                action="store_true",
+                help="Move leaf schemas that occur more than once into $defs (as _anon_N) and reference them",
+            ),
+            optparse.make_option(
+                "--jsonschema-jobs",
+                dest="schema_jobs",
+                type="int",
+                default=1,
+                help="Number of worker processes for the 'data' section (default: 1)",
+            ),
         ]
         group = optparser.add_option_group("JSON Schema-specific options")
         group.add_options(optlist)
@@ -55,32 +72,34 @@ class JSONSchemaPlugin(plugin.PyangPlugin):
 
         # Shared definitions dictionary prevents duplication between Data and RPCs
         self.definitions = {}
+        # Memoized produce_type results, keyed by statement identity
+        self._type_cache = {}
 
         # 1. Generate Data Schema
         # We apply the config_filter=True if the user requested config-only
-        apply_config_filter = getattr(ctx.opts, "schema_config_only", False)
-        data_properties = {}
-        for module in modules:
-            mod_props = produce_children(
-                module, self.definitions, ctx.opts, config_filter=apply_config_filter
-            )
-            data_properties.update(mod_props)
+        # Option lookups are invariant for the whole run: resolve them once here
+        # and pass plain bools down the recursion
+        apply_config_filter = bool(getattr(ctx.opts, "schema_config_only", False))
+        no_ns = bool(getattr(ctx.opts, "schema_no_ns", False))
+        data_properties = self.produce_data(
+            modules, no_ns, apply_config_filter, getattr(ctx.opts, "schema_jobs", 1)
+        )
 
         # 2. Generate Operations Schema
         # We search for RPCs and Actions. We do NOT apply config filters here.
         ops_properties = {}
         for module in modules:
             # 2a. Global RPCs
-            if hasattr(module, "i_children"):
-                for child in module.i_children:
-                    if child.keyword == "rpc":
-                        op_name = qualify_name(child)
-                        ops_properties[op_name] = self.produce_operation(
-                            child, ctx.opts
-                        )
+            for child in _children_by_keyword(module).get("rpc", ()):
+                op_name = qualify_name(child)
+                ops_properties[op_name] = self.produce_operation(child, no_ns)
 
             # 2b. Nested Actions
-            self.find_actions(module, ops_properties, ctx.opts)
+            self.find_actions(module, ops_properties, no_ns)
+
+        # 2c. Share repeated leaf schemas (opt-in: changes the $defs layout)
+        if getattr(ctx.opts, "schema_dedup", False):
+            dedup_schemas([data_properties, ops_properties], self.definitions)
 
         # 3. Construct Final Root Object
         result = {
@@ -110,18 +129,92 @@ class JSONSchemaPlugin(plugin.PyangPlugin):
         if not result["$defs"]:
             del result["$defs"]
 
-        fd.write(json.dumps(result, indent=2))
+        # Stream down to the per-node schemas (root > properties > data >
+        # properties) so the document is never held as one string
+        _write_json(fd, result, level=0, depth=4)
+
+    def produce_data(self, modules, no_ns, config_filter, jobs=1):
+        """
+        Generates the data properties of all modules.
+        With jobs > 1 each module is produced in a forked worker and the results
+        merged; the output is always the same as a serial run.
+        """
+        # Without namespaces, $defs keys of different modules can collide, so
+        # per-module $defs cannot be merged
+        if (
+            (jobs or 1) > 1
+            and not no_ns
+            and len(modules) >= _PARALLEL_MIN_MODULES
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            data_properties = self._produce_data_parallel(
+                modules, no_ns, config_filter, jobs
+            )
+            if data_properties is not None:
+                return data_properties
+            logging.debug("Worker $defs disagree, producing the data serially")
 
-    def find_actions(self, stmt, operations, opts):
-        """Recursively find 'action' statements in the data tree."""
-        if hasattr(stmt, "i_children"):
-            for child in stmt.i_children:
-                if child.keyword == "action":
-                    op_name = qualify_name(child)
-                    operations[op_name] = self.produce_operation(child, opts)
-                self.find_actions(child, operations, opts)
+        data_properties = {}
+        for module in modules:
+            mod_props = produce_children(
+                module,
+                self.definitions,
+                no_ns,
+                config_filter=config_filter,
+                type_cache=self._type_cache,
+            )
+            data_properties.update(mod_props)
+        return data_properties
+
+    def _produce_data_parallel(self, modules, no_ns, config_filter, jobs):
+        """
+        Produces the data properties in forked workers.
+        Returns None if two workers built different schemas for the same $defs
+        key (e.g. scoped typedefs sharing a name), since the merge would then
+        not match the serial output.
+        """
+        workers = min(jobs, len(modules))
+        logging.debug("Producing %d modules with %d workers", len(modules), workers)
 
-    def produce_operation(self, stmt, opts):
+        data_properties = {}
+        definitions = {}
+        global _fork_state
+        _fork_state = (modules, no_ns, config_filter)
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+            ) as pool:
+                # Merging in module order keeps the serial $defs order
+                for mod_props, mod_defs in pool.map(
+                    _produce_module, range(len(modules))
+                ):
+                    data_properties.update(mod_props)
+                    for def_key, schema in mod_defs.items():
+                        if def_key not in definitions:
+                            definitions[def_key] = schema
+                        elif definitions[def_key] != schema:
+                            return None
+        finally:
+            _fork_state = None
+
+        self.definitions.update(definitions)
+        return data_properties
+
+    def find_actions(self, stmt, operations, no_ns):
+        """Find 'action' statements in the data tree (iterative pre-order DFS)."""
+        # Children are pushed reversed so they pop in document order
+        stack = list(reversed(getattr(stmt, "i_children", None) or ()))
+        while stack:
+            child = stack.pop()
+            if child.keyword == "action":
+                op_name = qualify_name(child)
+                operations[op_name] = self.produce_operation(child, no_ns)
+            grandchildren = getattr(child, "i_children", None)
+            if grandchildren:
+                stack.extend(reversed(grandchildren))
+
+    def produce_operation(self, stmt, no_ns):
         """Generates schema for an RPC or Action (input and output)."""
         op_schema = {
             "type": "object",
@@ -142,7 +235,11 @@ class JSONSchemaPlugin(plugin.PyangPlugin):
             op_schema["properties"]["input"] = {
                 "type": "object",
                 "properties": produce_children(
-                    input_node, self.definitions, opts, config_filter=False
+                    input_node,
+                    self.definitions,
+                    no_ns,
+                    config_filter=False,
+                    type_cache=self._type_cache,
                 ),
                 "additionalProperties": False,
             }
@@ -151,7 +248,11 @@ class JSONSchemaPlugin(plugin.PyangPlugin):
             op_schema["properties"]["output"] = {
                 "type": "object",
                 "properties": produce_children(
-                    output_node, self.definitions, opts, config_filter=False
+                    output_node,
+                    self.definitions,
+                    no_ns,
+                    config_filter=False,
+                    type_cache=self._type_cache,
                 ),
                 "additionalProperties": False,
             }
@@ -159,37 +260,235 @@ class JSONSchemaPlugin(plugin.PyangPlugin):
         return annotate_schema(stmt, op_schema)
 
 
+# --- Parallel Data Generation ---
+
+# Minimum number of modules before the data section is spread over processes
+_PARALLEL_MIN_MODULES = 4
+
+# (modules, no_ns, config_filter) for the running emit. Set before forking so
+# workers inherit the parsed trees instead of having them pickled.
+_fork_state = None
+
+
+def _produce_module(index):
+    """Worker: produces one module's data properties with private $defs."""
+    modules, no_ns, config_filter = _fork_state
+    defs = {}
+    props = produce_children(
+        modules[index], defs, no_ns, config_filter=config_filter, type_cache={}
+    )
+    return props, defs
+
+
+# --- Structural Deduplication ---
+
+# Schemas whose canonical form is shorter than this stay inline: a $ref to
+# them would not be any smaller
+_DEDUP_MIN_SIZE = 64
+
+
+def _canonical(schema):
+    """Serializes schema with sorted keys, so equal schemas give equal keys."""
+    return orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)
+
+
+def dedup_schemas(properties_maps, defs):
+    """
+    Moves leaf and leaf-list schemas that occur more than once into defs and
+    replaces every occurrence with a $ref. Containers and lists are walked into,
+    never shared themselves.
+    """
+    # 1. Collect candidate sites (breadth-first, in document order)
+    sites = []
+    counts = {}
+    pending = list(properties_maps)
+    for props in pending:
+        for name, schema in props.items():
+            nested = schema.get("properties")
+            if nested is None and isinstance(schema.get("items"), dict):
+                nested = schema["items"].get("properties")
+            if nested is not None:
+                pending.append(nested)
+                continue
+
+            key = _canonical(schema)
+            if len(key) < _DEDUP_MIN_SIZE:
+                continue
+            counts[key] = counts.get(key, 0) + 1
+            sites.append((props, name, key))
+
+    # 2. Replace repeated schemas with references to a shared definition
+    refs = {}
+    anon_id = 0
+    for props, name, key in sites:
+        if counts[key] < 2:
+            continue
+        ref = refs.get(key)
+        if ref is None:
+            while "_anon_%d" % anon_id in defs:
+                anon_id += 1
+            def_key = "_anon_%d" % anon_id
+            defs[def_key] = props[name]
+            ref = refs[key] = "#/$defs/%s" % def_key
+        props[name] = {"$ref": ref}
+
+
+# --- Output ---
+
+
+# orjson writes everything outside printable ASCII raw. json.dumps escapes it
+# (ensure_ascii); keep that encoding so the output is safe on any terminal.
+_NON_ASCII = re.compile(r"[^\x00-\x7e]")
+
+
+def _escape_non_ascii(match):
+    code = ord(match.group())
+    if code < 0x10000:
+        return "\\u%04x" % code
+    # Astral characters become a UTF-16 surrogate pair, as in json.dumps
+    code -= 0x10000
+    return "\\u%04x\\u%04x" % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+
+
+def _dumps(value):
+    """Serializes value as 2-space indented JSON, byte-identical to json.dumps."""
+    text = orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
+    if not text.isascii() or "\x7f" in text:
+        text = _NON_ASCII.sub(_escape_non_ascii, text)
+    return text
+
+
+def _write_json(fd, value, level, depth):
+    """
+    Writes value to fd laid out exactly as _dumps() would at nesting `level`.
+    Objects above `depth` are written one member at a time and consumed as
+    they go, so each serialized subtree can be released straight away.
+    """
+    if not isinstance(value, dict) or not value or level >= depth:
+        fd.write(_dumps(value).replace("\n", "\n" + "  " * level))
+        return
+
+    indent = "\n" + "  " * (level + 1)
+    separator = "{" + indent
+    for key in list(value):
+        member = value.pop(key)
+        fd.write(separator + _dumps(key) + ": ")
+        _write_json(fd, member, level + 1, depth)
+        separator = "," + indent
+    fd.write("\n" + "  " * level + "}")
+
+
 # --- Core Logic (Unified) ---
 
+# Shared schema templates for built-in types. Never mutate these: produce_type
+# hands out shallow copies, which annotate_schema is free to modify.
+_INT_SCHEMA = {"type": "integer"}
+# RFC 7951: 64-bit integers are strings
+_INT64_SCHEMA = {"type": "string", "pattern": "^-?[0-9]+$"}
+# RFC 7951: strictly requires decimal point for canonical format in some contexts,
+# usually safer to enforce strict regex.
+_DEC64_SCHEMA = {"type": "string", "pattern": "^-?[0-9]+\\.[0-9]+$"}
+_STR_SCHEMA = {"type": "string"}
+_BOOL_SCHEMA = {"type": "boolean"}
+_EMPTY_SCHEMA = {"type": "array", "prefixItems": [{"type": "null"}], "maxItems": 1}
+
+# Built-in types whose schema does not depend on any substatement
+_SIMPLE_TYPE_SCHEMAS = {
+    # Numeric Types
+    "int8": _INT_SCHEMA,
+    "int16": _INT_SCHEMA,
+    "int32": _INT_SCHEMA,
+    "uint8": _INT_SCHEMA,
+    "uint16": _INT_SCHEMA,
+    "uint32": _INT_SCHEMA,
+    "int64": _INT64_SCHEMA,
+    "uint64": _INT64_SCHEMA,
+    "decimal64": _DEC64_SCHEMA,
+    # Boolean & Empty
+    "boolean": _BOOL_SCHEMA,
+    "empty": _EMPTY_SCHEMA,
+}
+
+
+def _children_by_keyword(stmt):
+    """Groups stmt.i_children by keyword in one pass, keeping document order."""
+    by_kw = {}
+    for child in getattr(stmt, "i_children", None) or ():
+        by_kw.setdefault(child.keyword, []).append(child)
+    return by_kw
 
-def produce_children(stmt, defs, opts, config_filter=False):
+
+def produce_children(stmt, defs, no_ns, config_filter=False, type_cache=None):
     """
     Generates properties for child nodes.
+    no_ns: If True, $defs keys are not prefixed with the module name.
     config_filter: If True, excludes read-only (non-config) nodes.
+    type_cache: Optional dict memoizing produce_type results across the walk.
+
+    The whole subtree is walked with an explicit stack instead of recursion:
+    container and list schemas are inserted into their parent as soon as they
+    are visited, and their children are queued to fill in their properties.
     """
     props = {}
-    if hasattr(stmt, "i_children"):
-        for child in stmt.i_children:
-            # Filtering Logic
-            if config_filter:
-                if hasattr(child, "i_config") and child.i_config is False:
-                    continue
-
-            if child.keyword in producers:
-                member_name = qualify_name(child)
-                # Pass the config_filter down recursively
-                schema = producers[child.keyword](child, defs, opts, config_filter)
-                if schema:
-                    props[member_name] = schema
+
+    # (node, properties dict it belongs to). Pushed in reverse so nodes pop in
+    # document order, i.e. the same pre-order a recursive walk would follow.
+    children = getattr(stmt, "i_children", None) or ()
+    work = [(child, props) for child in reversed(children)]
+    while work:
+        child, target = work.pop()
+
+        # Filtering Logic
+        if config_filter and getattr(child, "i_config", None) is False:
+            continue
+
+        # Dispatch on keyword, most frequent first
+        kw = child.keyword
+        child_props = None
+        if kw == "leaf":
+            schema = produce_leaf(child, defs, no_ns, config_filter, type_cache)
+        elif kw == "container":
+            schema = produce_container(child)
+            child_props = schema["properties"]
+        elif kw == "list":
+            schema = produce_list(child)
+            child_props = schema["items"]["properties"]
+        elif kw == "leaf-list":
+            schema = produce_leaf_list(child, defs, no_ns, config_filter, type_cache)
+        elif kw == "anydata" or kw == "anyxml":
+            schema = {"type": "object"}
+        else:
+            # Choices are flattened in JSON; everything else is not data
+            continue
+
+        if schema:
+            target[qualify_name(child)] = schema
+
+        if child_props is not None:
+            grandchildren = getattr(child, "i_children", None)
+            if grandchildren:
+                work.extend((gc, child_props) for gc in reversed(grandchildren))
     return props
 
 
+# Interned "module:name" strings, keyed by (module name, node name)
+_qname_cache = {}
+
+
+def _module_qualified(mod_name, arg):
+    key = (mod_name, arg)
+    name = _qname_cache.get(key)
+    if name is None:
+        name = _qname_cache[key] = sys.intern("%s:%s" % key)
+    return name
+
+
 def qualify_name(stmt):
     # Logic covers both Data (parent module check) and RPCs (always qualified at top level)
 
     # 1. Force qualification for top-level RPCs/Actions to avoid collisions
     if stmt.keyword in ("rpc", "action"):
-        return "%s:%s" % (stmt.i_module.arg, stmt.arg)
+        return _module_qualified(stmt.i_module.arg, stmt.arg)
 
     # 2. Standard Logic
     is_top_level = stmt.parent.keyword in ("module", "submodule")
@@ -197,11 +496,33 @@ def qualify_name(stmt):
     parent_mod = getattr(stmt.parent, "i_module", None)
 
     if is_top_level or (parent_mod and this_mod.arg != parent_mod.arg):
-        return "%s:%s" % (this_mod.arg, stmt.arg)
+        return _module_qualified(this_mod.arg, stmt.arg)
 
     return stmt.arg
 
 
+def _enum_summary(type_stmt):
+    """
+    Returns the "Supported values" text of an enumeration type ("" if none of
+    its enums are described). Cached on the statement: every leaf expanded from
+    the same grouping shares one type statement.
+    """
+    summary = getattr(type_stmt, "_enum_summary_text", None)
+    if summary is None:
+        # Format each bullet in the same pass that collects it
+        enum_lines = []
+        for en in type_stmt.search("enum"):
+            en_desc = en.search_one("description")
+            if en_desc:
+                enum_lines.append("  * %s: %s" % (en.arg, en_desc.arg.strip()))
+
+        summary = ""
+        if enum_lines:
+            summary = "Supported values:\n" + "\n".join(enum_lines)
+        type_stmt._enum_summary_text = summary
+    return summary
+
+
 def annotate_schema(stmt, schema):
     if schema is None:
         return None
@@ -216,21 +537,12 @@ def annotate_schema(stmt, schema):
     # 2. Enum values description
     type_stmt = stmt.search_one("type")
     if type_stmt and type_stmt.arg == "enumeration":
-        enum_descs = []
-        for en in type_stmt.search("enum"):
-            en_desc = en.search_one("description")
-            if en_desc:
-                enum_descs.append("%s: %s" % (en.arg, en_desc.arg.strip()))
-
-        if enum_descs:
-            descriptions.append(
-                "Supported values:\n" + "\n".join(["  * " + d for d in enum_descs])
-            )
+        enum_summary = _enum_summary(type_stmt)
+        if enum_summary:
+            descriptions.append(enum_summary)
 
     # 3. When statements
-    when_stmts = stmt.search("when")
-    for w in when_stmts:
-        descriptions.append("Condition: %s" % w.arg)
+    descriptions.extend("Condition: %s" % w.arg for w in stmt.search("when"))
 
     if descriptions:
         schema["description"] = "\n\n".join(descriptions)
@@ -238,50 +550,60 @@ def annotate_schema(stmt, schema):
     return schema
 
 
-def produce_container(stmt, defs, opts, config_filter):
+def produce_container(stmt):
+    # Properties are filled in afterwards by the produce_children walk
     schema = {
         "type": "object",
-        "properties": produce_children(stmt, defs, opts, config_filter),
+        "properties": {},
         "additionalProperties": False,
     }
     return annotate_schema(stmt, schema)
 
 
-def produce_list(stmt, defs, opts, config_filter):
+def produce_list(stmt):
+    # Item properties are filled in afterwards by the produce_children walk
     schema = {
         "type": "array",
         "items": {
             "type": "object",
-            "properties": produce_children(stmt, defs, opts, config_filter),
+            "properties": {},
             "additionalProperties": False,
         },
     }
     return annotate_schema(stmt, schema)
 
 
-def produce_leaf_list(stmt, defs, opts, config_filter):
+def produce_leaf_list(stmt, defs, no_ns, config_filter, type_cache=None):
     # Leaf lists don't recurse structure, but we pass args for consistency
     schema = {
         "type": "array",
-        "items": produce_type(stmt.search_one("type"), defs, opts),
+        "items": produce_type(stmt.search_one("type"), defs, no_ns, type_cache),
     }
     return annotate_schema(stmt, schema)
 
 
-def produce_leaf(stmt, defs, opts, config_filter):
-    schema = produce_type(stmt.search_one("type"), defs, opts)
+def produce_leaf(stmt, defs, no_ns, config_filter, type_cache=None):
+    schema = produce_type(stmt.search_one("type"), defs, no_ns, type_cache)
     return annotate_schema(stmt, schema)
 
 
-def produce_type(type_stmt, defs, opts):
+def produce_type(type_stmt, defs, no_ns, type_cache=None):
     if not type_stmt:
-        return {"type": "string"}
+        return dict(_STR_SCHEMA)
+
+    if type_cache is None:
+        type_cache = {}
 
     # Handle Typedefs (Shared $defs)
     if hasattr(type_stmt, "i_typedef") and type_stmt.i_typedef:
         typedef = type_stmt.i_typedef
 
-        if opts.schema_no_ns:
+        # Already resolved: skip the key formatting and dedup check
+        cached = type_cache.get(id(typedef))
+        if cached is not None:
+            return {"$ref": cached}
+
+        if no_ns:
             def_key = typedef.arg
         else:
             def_key = "%s_%s" % (typedef.i_module.arg, typedef.arg)
@@ -290,57 +612,51 @@ def produce_type(type_stmt, defs, opts):
         if def_key not in defs:
             defs[def_key] = {}  # Placeholder to prevent infinite recursion
             base_type_stmt = typedef.search_one("type")
-            base_schema = produce_type(base_type_stmt, defs, opts)
+            base_schema = produce_type(base_type_stmt, defs, no_ns, type_cache)
             defs[def_key] = annotate_schema(typedef, base_schema)
 
-        return {"$ref": "#/$defs/%s" % def_key}
+        ref = type_cache[id(typedef)] = "#/$defs/%s" % def_key
+        return {"$ref": ref}
+
+    # Inline types: callers annotate the returned schema in place, so hand
+    # out a shallow copy of the memoized one
+    cache_key = (id(type_stmt), no_ns)
+    cached = type_cache.get(cache_key)
+    if cached is None:
+        cached = type_cache[cache_key] = _produce_inline_type(
+            type_stmt, defs, no_ns, type_cache
+        )
+    return dict(cached)
 
+
+def _produce_inline_type(type_stmt, defs, no_ns, type_cache):
+    # May return a shared template; produce_type copies before handing it out
     type_name = type_stmt.arg
 
-    # Numeric Types
-    if type_name in ["int8", "int16", "int32", "uint8", "uint16", "uint32"]:
-        return {"type": "integer"}
-    if type_name in ["int64", "uint64"]:
-        # RFC 7951: 64-bit integers are strings
-        return {"type": "string", "pattern": "^-?[0-9]+$"}
-    if type_name == "decimal64":
-        # RFC 7951: strictly requires decimal point for canonical format in some contexts,
-        # usually safer to enforce strict regex.
-        return {"type": "string", "pattern": "^-?[0-9]+\\.[0-9]+$"}
-
-    # String & Boolean
+    # Numeric, Boolean & Empty: a single hashed lookup
+    schema = _SIMPLE_TYPE_SCHEMAS.get(type_name)
+    if schema is not None:
+        return schema
+
+    # String
     if type_name == "string":
-        schema = {"type": "string"}
         pattern = type_stmt.search_one("pattern")
         if pattern:
-            schema["pattern"] = pattern.arg
-        return schema
-    if type_name == "boolean":
-        return {"type": "boolean"}
+            return {"type": "string", "pattern": pattern.arg}
+        return _STR_SCHEMA
 
-    # Enum & Empty
+    # Enum
     if type_name == "enumeration":
         return {"type": "string", "enum": [e.arg for e in type_stmt.search("enum")]}
-    if type_name == "empty":
-        return {"type": "array", "prefixItems": [{"type": "null"}], "maxItems": 1}
 
     # Union (Missing in your operations plugin previously)
     if type_name == "union":
         return {
-            "anyOf": [produce_type(t, defs, opts) for t in type_stmt.search("type")]
+            "anyOf": [
+                produce_type(t, defs, no_ns, type_cache)
+                for t in type_stmt.search("type")
+            ]
         }
 
     # Fallback
-    return {"type": "string"}
-
-
-# Producer Map
-producers = {
-    "container": produce_container,
-    "list": produce_list,
-    "leaf-list": produce_leaf_list,
-    "leaf": produce_leaf,
-    "choice": lambda s, d, o, f: None,  # Choices are flattened in JSON
-    "anydata": lambda s, d, o, f: {"type": "object"},
-    "anyxml": lambda s, d, o, f: {"type": "object"},
-}
+    return _STR_SCHEMA
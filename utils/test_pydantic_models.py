@@ -31,7 +31,8 @@ def main():
     except AttributeError:
         raise ValueError(f"model '{args.model}' not found in module '{args.module}'")
 
-    payload = Path("temp/instance.json").read_text(encoding="utf-8")
+    # Raw bytes go straight to pydantic's JSON parser, without a decode step
+    payload = Path(args.json).read_bytes()
     instance = Model.model_validate_json(payload)
     print(f"{instance.model_dump_json(indent=2, by_alias=True, exclude_unset=True)}")
     print("All good!")
@@ -6,19 +6,26 @@
 # ]
 # ///
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ncclient import manager
-from lxml import etree
+
+NETCONF_MONITORING_NS = "urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring"
 
 
 class YangDownloader:
     """Analytical approach to stripping a device of its YANG models."""
 
-    def __init__(self, host, port, user, password, output_dir="yang_models"):
+    # Schemas are written out in slices of this size (and buffered likewise)
+    WRITE_CHUNK = 1 << 20
+
+    def __init__(self, host, port, user, password, output_dir="yang_models", workers=8):
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.output_dir = output_dir
+        # Upper bound on get-schema requests in flight at once on the session
+        self.workers = workers
 
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
@@ -31,9 +38,36 @@ class YangDownloader:
         </netconf-state>
         """
         response = netconf_manager.get(filter=("subtree", filter_exp))
-        root = etree.fromstring(response.xml.encode())
-        namespaces = {"mon": "urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring"}
-        return root.xpath("//mon:schema", namespaces=namespaces)
+
+        # Walk the reply ncclient has already parsed instead of re-parsing it
+        schemas = []
+        for elem in response.data_ele.iter("{%s}schema" % NETCONF_MONITORING_NS):
+            name = elem.findtext("{%s}identifier" % NETCONF_MONITORING_NS)
+            if not name:
+                # Nothing to request or to name the file after
+                continue
+            # An empty <version/> means no revision, as before
+            version = elem.findtext("{%s}version" % NETCONF_MONITORING_NS) or None
+            schemas.append((name, version))
+        return schemas
+
+    def save_schema(self, filepath, content):
+        """Writes the schema text to disk slice by slice, never encoding it whole."""
+        with open(filepath, "w", encoding="utf-8", buffering=self.WRITE_CHUNK) as f:
+            for start in range(0, len(content), self.WRITE_CHUNK):
+                f.write(content[start : start + self.WRITE_CHUNK])
+
+    def fetch_schema(self, netconf_manager, name, version):
+        """Retrieves a single schema and saves it, reporting the outcome."""
+        filename = f"{name}@{version}.yang" if version else f"{name}.yang"
+        filepath = os.path.join(self.output_dir, filename)
+
+        try:
+            content = netconf_manager.get_schema(identifier=name, version=version).data
+            self.save_schema(filepath, content)
+            return f"[+] Saved: {filename}"
+        except Exception as e:
+            return f"[!] Failed to fetch {name}: {e}"
 
     def download_all(self):
         """Iterates and executes the get-schema operation for every identified model."""
@@ -48,24 +82,17 @@ class YangDownloader:
                 schemas = self.get_schema_list(m)
                 print(f"[*] Found {len(schemas)} schemas. Starting extraction...")
 
-                for schema in schemas:
-                    name = schema.find(
-                        "{urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring}identifier"
-                    ).text
-                    version = schema.find(
-                        "{urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring}version"
-                    ).text
-
-                    filename = f"{name}@{version}.yang" if version else f"{name}.yang"
-                    filepath = os.path.join(self.output_dir, filename)
-
-                    try:
-                        content = m.get_schema(identifier=name, version=version).data
-                        with open(filepath, "w", encoding="utf-8") as f:
-                            f.write(content)
-                        print(f"[+] Saved: {filename}")
-                    except Exception as e:
-                        print(f"[!] Failed to fetch {name}: {e}")
+                # get-schema is latency bound: keep several RPCs in flight on
+                # the one session (ncclient matches replies by message-id)
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    futures = []
+                    for name, version in schemas:
+                        futures.append(
+                            executor.submit(self.fetch_schema, m, name, version)
+                        )
+
+                    for future in as_completed(futures):
+                        print(future.result())
 
         except Exception as e:
             print(f"CRITICAL SYSTEM ERROR: {e}")
@@ -87,6 +114,13 @@ def main():
         help="save .yang files inside this dir (default: ./temp/yang_models)",
         default="temp/yang_models",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="concurrent get-schema requests (default: 8)",
+        type=int,
+        default=8,
+    )
 
     args = parser.parse_args()
     extractor = YangDownloader(
@@ -95,6 +129,7 @@ def main():
         user=args.username,
         password=args.password,
         output_dir=args.output_dir,
+        workers=args.workers,
     )
     extractor.download_all()
 